@@ -28,31 +28,21 @@ def _get_clients():
     global _project_client, _openai_client
     if _project_client is None:
         from azure.ai.projects import AIProjectClient
-        from azure.identity import ClientSecretCredential
+        from shared import get_credential
 
-        cred = ClientSecretCredential(
-            tenant_id=os.getenv("AZURE_TENANT_ID"),
-            client_id=os.getenv("AZURE_CLIENT_ID"),
-            client_secret=os.getenv("AZURE_CLIENT_SECRET"),
-        )
-        _project_client = AIProjectClient(endpoint=PROJECT_ENDPOINT, credential=cred)
+        _project_client = AIProjectClient(endpoint=PROJECT_ENDPOINT, credential=get_credential())
         _openai_client = _project_client.get_openai_client()
     return _project_client, _openai_client
 
 
 def _get_azure_responses_client():
     from agent_framework.azure import AzureOpenAIResponsesClient
-    from azure.identity import ClientSecretCredential
+    from shared import get_credential
 
-    cred = ClientSecretCredential(
-        tenant_id=os.getenv("AZURE_TENANT_ID"),
-        client_id=os.getenv("AZURE_CLIENT_ID"),
-        client_secret=os.getenv("AZURE_CLIENT_SECRET"),
-    )
     return AzureOpenAIResponsesClient(
         project_endpoint=PROJECT_ENDPOINT,
         deployment_name=MODEL_DEPLOYMENT_NAME,
-        credential=cred,
+        credential=get_credential(),
     )
 
 
@@ -121,7 +111,7 @@ def step3_reset():
 # ---------------------------------------------------------------------------
 # Step 4: Memory & Persistence
 # ---------------------------------------------------------------------------
-_step4_facts: list[str] = []
+_step4_facts: dict[str, None] = {}  # ordered, O(1) dedup
 _step4_session_id: str | None = None
 
 
@@ -130,25 +120,21 @@ def step4_extract_facts(text: str):
     if "my name is" in lower:
         name = lower.split("my name is")[-1].strip().split()[0].capitalize()
         fact = f"Name: {name}"
-        if fact not in _step4_facts:
-            _step4_facts.append(fact)
+        _step4_facts.setdefault(fact)
     if "from " in lower and ("live" in lower or "i'm from" in lower or "i am from" in lower):
         location = text.split("from")[-1].strip().rstrip(".,!").split(" and ")[0]
         fact = f"Location: {location}"
-        if fact not in _step4_facts:
-            _step4_facts.append(fact)
+        _step4_facts.setdefault(fact)
     for kw in ["i'm a ", "i am a ", "i work as ", "my job is "]:
         if kw in lower:
-            prof = text.lower().split(kw)[-1].strip().split(".")[0].split(",")[0].split(" and ")[0]
+            prof = lower.split(kw)[-1].strip().split(".")[0].split(",")[0].split(" and ")[0]
             fact = f"Profession: {prof.title()}"
-            if fact not in _step4_facts:
-                _step4_facts.append(fact)
+            _step4_facts.setdefault(fact)
     for kw in ["i love ", "i like ", "i enjoy ", "my hobby is "]:
         if kw in lower:
-            interest = text.lower().split(kw)[-1].strip().rstrip(".,!").split(" and ")[0]
+            interest = lower.split(kw)[-1].strip().rstrip(".,!").split(" and ")[0]
             fact = f"Interest: {interest.title()}"
-            if fact not in _step4_facts:
-                _step4_facts.append(fact)
+            _step4_facts.setdefault(fact)
 
 
 def step4_chat(user_message, history):
@@ -185,7 +171,7 @@ def step4_chat(user_message, history):
 
 def step4_reset():
     global _step4_facts, _step4_session_id
-    _step4_facts = []
+    _step4_facts = {}
     _step4_session_id = None
     return [], "", "No memories stored yet."
 
@@ -1 +1,21 @@
-from shared.azure_client import get_credential, get_project_client, get_openai_client
+from shared.errors import format_traceback
+from shared.guide import load_guide
+
+# The Azure client factories pull in the Azure SDK, openai and dotenv, so they are
+# imported on first use; load_guide alone stays cheap (step6's test UI needs only that)
+_AZURE_CLIENT_NAMES = {
+    "get_credential",
+    "get_async_credential",
+    "get_project_client",
+    "get_async_project_client",
+    "get_openai_client",
+    "get_async_openai_client",
+}
+
+
+def __getattr__(name):
+    if name in _AZURE_CLIENT_NAMES:
+        from shared import azure_client
+
+        return getattr(azure_client, name)
+    raise AttributeError(f"module 'shared' has no attribute {name!r}")
@@ -1,19 +1,55 @@
 import os
+from functools import lru_cache
+
+import httpx
 from dotenv import load_dotenv
-from azure.identity import ClientSecretCredential
+from azure.identity import ClientSecretCredential, TokenCachePersistenceOptions
+from azure.identity.aio import ClientSecretCredential as AsyncClientSecretCredential
 from azure.ai.projects import AIProjectClient
+from azure.ai.projects.aio import AIProjectClient as AsyncAIProjectClient
+from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
 
 load_dotenv()
 
+# One keep-alive pool per process, large enough for concurrent users plus tool fan-out
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=100)
+
+
+def _token_cache_options():
+    """Opt-in on-disk AAD token cache so restarts don't re-fetch a bearer token."""
+    if os.getenv("AZURE_TOKEN_CACHE_PERSIST", "").lower() in ("1", "true", "yes"):
+        return {"cache_persistence_options": TokenCachePersistenceOptions(name="azure_foundry_basic_agent")}
+    return {}
 
+
+@lru_cache(maxsize=1)
 def get_credential():
+    """The process-wide sync credential; all sync clients share its token cache.
+
+    get_async_credential() is a separate instance with its own in-memory cache, so a
+    process using both fetches two tokens. Only AZURE_TOKEN_CACHE_PERSIST=1 makes them
+    share one, through the on-disk cache. It is opt-in because it needs a keyring.
+    """
     return ClientSecretCredential(
         tenant_id=os.getenv("AZURE_TENANT_ID"),
         client_id=os.getenv("AZURE_CLIENT_ID"),
         client_secret=os.getenv("AZURE_CLIENT_SECRET"),
+        **_token_cache_options(),
     )
 
 
+@lru_cache(maxsize=1)
+def get_async_credential():
+    """The process-wide async credential (see get_credential for token sharing)."""
+    return AsyncClientSecretCredential(
+        tenant_id=os.getenv("AZURE_TENANT_ID"),
+        client_id=os.getenv("AZURE_CLIENT_ID"),
+        client_secret=os.getenv("AZURE_CLIENT_SECRET"),
+        **_token_cache_options(),
+    )
+
+
+@lru_cache(maxsize=1)
 def get_project_client():
     return AIProjectClient(
         endpoint=os.getenv("AZURE_ENDPOINT"),
@@ -21,5 +57,24 @@ def get_project_client():
     )
 
 
+@lru_cache(maxsize=1)
+def get_async_project_client():
+    return AsyncAIProjectClient(
+        endpoint=os.getenv("AZURE_ENDPOINT"),
+        credential=get_async_credential(),
+    )
+
+
+@lru_cache(maxsize=1)
 def get_openai_client():
-    return get_project_client().get_openai_client()
+    # get_openai_client() sets http_client itself, so swap the pool in on the built client
+    return get_project_client().get_openai_client().with_options(
+        http_client=DefaultHttpxClient(limits=HTTP_LIMITS),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_async_openai_client():
+    return get_async_project_client().get_openai_client().with_options(
+        http_client=DefaultAsyncHttpxClient(limits=HTTP_LIMITS),
+    )
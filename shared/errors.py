@@ -0,0 +1,12 @@
+import traceback
+
+
+def format_traceback(error):
+    """Format a handler's captured exception for the "Show traceback" panel.
+
+    Handlers return a one-line summary and keep the exception in gr.State; the
+    traceback is formatted here, in a follow-up event, after the summary is shown.
+    """
+    if error is None:
+        return "No error captured."
+    return "".join(traceback.format_exception(error))
@@ -0,0 +1,17 @@
+from functools import lru_cache
+from pathlib import Path
+
+
+def load_guide(path):
+    """Read a guide (or other bundled text file), cached until the file's mtime changes."""
+    path = Path(path)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return f"{path.name} not found."
+    return _read_text(path, mtime)
+
+
+@lru_cache(maxsize=32)
+def _read_text(path, mtime):
+    return path.read_text(encoding="utf-8")
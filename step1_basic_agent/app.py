@@ -1,44 +1,56 @@
+import asyncio
 import os
-import sys
 from pathlib import Path
 
-# Add project root to path for shared imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
 import gradio as gr
 from azure.ai.projects.models import PromptAgentDefinition
-from shared import get_project_client, get_openai_client
+from shared import get_async_project_client, get_async_openai_client, load_guide
 
-project_client = get_project_client()
-openai_client = get_openai_client()
+project_client = get_async_project_client()
+openai_client = get_async_openai_client()
 
 AGENT_NAME = "AzureFoundryAgent"
 MODEL_DEPLOYMENT_NAME = os.getenv("MODEL_DEPLOYMENT_NAME")
+
+CONCURRENCY_LIMIT = int(os.getenv("CONCURRENCY_LIMIT", "16"))
+
 RESPONSE_CONSTRAINT = 'Keep your response "one-line" only.'
 
 
-def send_message(user_prompt):
-    instructions = f"You are a helpful agent.\n\n{RESPONSE_CONSTRAINT}"
+INSTRUCTIONS = f"You are a helpful agent.\n\n{RESPONSE_CONSTRAINT}"
+
+# Agent references keyed on the (model, instructions) pair they were created from,
+# so create_version only hits the control plane when the definition changes.
+_agent_refs: dict[tuple[str, str], dict] = {}
+_agent_lock = asyncio.Lock()
+
+
+async def get_agent_ref(instructions=INSTRUCTIONS):
+    key = (MODEL_DEPLOYMENT_NAME, instructions)
+    async with _agent_lock:
+        if key not in _agent_refs:
+            agent = await project_client.agents.create_version(
+                agent_name=AGENT_NAME,
+                definition=PromptAgentDefinition(
+                    model=MODEL_DEPLOYMENT_NAME,
+                    instructions=instructions,
+                ),
+            )
+            _agent_refs[key] = {"name": agent.name, "type": "agent_reference"}
+    return _agent_refs[key]
 
-    agent = project_client.agents.create_version(
-        agent_name=AGENT_NAME,
-        definition=PromptAgentDefinition(
-            model=MODEL_DEPLOYMENT_NAME,
-            instructions=instructions,
-        ),
-    )
 
-    response = openai_client.responses.create(
+async def send_message(user_prompt):
+    response = await openai_client.responses.create(
         input=[{"role": "user", "content": user_prompt}],
-        extra_body={"agent": {"name": agent.name, "type": "agent_reference"}},
+        extra_body={"agent": await get_agent_ref()},
     )
 
     return response.output_text
 
 
-# Load setup guide markdown
-guide_path = Path(__file__).parent / "instructions.md"
-guide_content = guide_path.read_text(encoding="utf-8") if guide_path.exists() else "instructions.md not found."
+# Setup guide markdown, read on first open of its tab
+GUIDE_PATH = Path(__file__).parent / "instructions.md"
 
 with gr.Blocks(title="Step 1: Basic Agent", theme=gr.themes.Soft(primary_hue="purple")) as app:
     gr.Markdown("# Step 1: Basic Azure Foundry Agent")
@@ -65,7 +77,9 @@ with gr.Blocks(title="Step 1: Basic Agent", theme=gr.themes.Soft(primary_hue="pu
             outputs=response_output,
         )
 
-    with gr.Tab("Setup Guide"):
-        gr.Markdown(guide_content)
+    with gr.Tab("Setup Guide") as guide_tab:
+        guide_output = gr.Markdown()
+        guide_tab.select(fn=lambda: load_guide(GUIDE_PATH), outputs=guide_output)
 
+app.queue(default_concurrency_limit=CONCURRENCY_LIMIT, max_size=128)
 app.launch(footer_links=[])
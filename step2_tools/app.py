@@ -1,74 +1,343 @@
-# Step 2: Agent with Tools
-# Coming soon - file search, code interpreter, Bing grounding, etc.
-
+# Step 2: Agent with Tools — function calling against simulated data sources
+import asyncio
+import bisect
+import json
 import os
-import sys
+import re
+import traceback
 from pathlib import Path
 
-# Add project root to path for shared imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
 import gradio as gr
-from azure.ai.projects.models import PromptAgentDefinition
-from shared import get_project_client, get_openai_client
+import orjson
+from shared import get_async_openai_client, load_guide
 
-project_client = get_project_client()
-openai_client = get_openai_client()
+openai_client = get_async_openai_client()
 
-AGENT_NAME = "AzureFoundryAgent"
 MODEL_DEPLOYMENT_NAME = os.getenv("MODEL_DEPLOYMENT_NAME")
-RESPONSE_CONSTRAINT = 'Keep your response "one-line" only.'
 
+# Lower default than steps 1, 3 and 4: each request makes 2-3 model calls
+CONCURRENCY_LIMIT = int(os.getenv("CONCURRENCY_LIMIT", "6"))
 
-def send_message(user_prompt):
-    instructions = f"You are a helpful agent.\n\n{RESPONSE_CONSTRAINT}"
+MAX_TOOL_ROUNDS = 5
 
-    agent = project_client.agents.create_version(
-        agent_name=AGENT_NAME,
-        definition=PromptAgentDefinition(
-            model=MODEL_DEPLOYMENT_NAME,
-            instructions=instructions,
-        ),
-    )
+# Batch jobs need a Global Batch deployment; defaults to the real-time one
+BATCH_DEPLOYMENT_NAME = os.getenv("BATCH_DEPLOYMENT_NAME", MODEL_DEPLOYMENT_NAME)
+BATCH_POLL_SECONDS = 30
+
+INSTRUCTIONS = (
+    "You are a helpful store assistant. Use the available tools to look up weather, "
+    "products, and company policies instead of guessing. Keep answers short and friendly."
+)
+
+
+# ---------------------------------------------------------------------------
+# Simulated data sources
+# ---------------------------------------------------------------------------
+DATA_DIR = Path(__file__).parent / "data"
+
+
+def _load(name):
+    return orjson.loads((DATA_DIR / name).read_bytes())
+
+
+def fast_dumps(obj):
+    """Compact JSON for tool outputs sent to the model (orjson's C encoder)."""
+    return orjson.dumps(obj).decode()
+
+
+def pretty_dumps(obj):
+    """Indented JSON for the UI's tool-call log."""
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+
+
+TOOL_DEFINITIONS = _load("tool_definitions.json")
+WEATHER_DATA = _load("weather.json")
+PRODUCT_DB = _load("products.json")
+KNOWLEDGE_BASE = _load("knowledge_base.json")
+STARTER_PROMPTS = [[p] for p in _load("sample_prompts.json")]
+
+# Tool responses that only depend on the data files are built once here
+WEATHER_RESULTS = {city: {"city": city.title(), **data} for city, data in WEATHER_DATA.items()}
+PRODUCT_RESULTS_ALL = {
+    category: {"category": category, "result_count": len(products), "products": products}
+    for category, products in PRODUCT_DB.items()
+}
+
+# category -> (products sorted by price, their prices) so max_price filters with bisect
+PRODUCT_BY_PRICE = {}
+for category, products in PRODUCT_DB.items():
+    by_price = sorted(products, key=lambda p: p["price"])
+    PRODUCT_BY_PRICE[category] = (by_price, [p["price"] for p in by_price])
+
+# (topic, topic words, content) — split once at load instead of on every search
+KB_INDEX = [(key, set(key.split()), content) for key, content in KNOWLEDGE_BASE.items()]
+WORD_PATTERN = re.compile(r"\w+")
+
+
+# ---------------------------------------------------------------------------
+# Tool implementations (each returns a dict; encoded once when sent to the model)
+# ---------------------------------------------------------------------------
+def get_weather(args):
+    """Simulates an external weather API call."""
+    city = args.get("city", "")
+    cached = WEATHER_RESULTS.get(city.lower())
+    if cached is not None:
+        return cached
+    return {"city": city.title(), "temp": "N/A", "condition": "Unknown", "humidity": "N/A", "wind": "N/A"}
+
+
+def query_products(args):
+    """Simulates a product database query."""
+    category = args.get("category", "").lower()
+    max_price = args.get("max_price")
+    if max_price is None and category in PRODUCT_RESULTS_ALL:
+        return PRODUCT_RESULTS_ALL[category]
+    by_price, prices = PRODUCT_BY_PRICE.get(category, ([], []))
+    products = by_price[:bisect.bisect_right(prices, max_price)] if max_price is not None else by_price
+    return {"category": category, "result_count": len(products), "products": products}
+
+
+def search_knowledge_base(args):
+    """Simulates a knowledge base search."""
+    query = args.get("query", "")
+    query_lower = query.lower()
+    query_words = set(WORD_PATTERN.findall(query_lower))
+    matches = [
+        {"topic": key, "content": content}
+        for key, words, content in KB_INDEX
+        if key in query_lower or words & query_words
+    ]
+    if not matches:
+        return {"query": query, "results": [], "message": "No matching articles found."}
+    return {"query": query, "results": matches}
+
+
+TOOL_FUNCTIONS = {
+    "get_weather": get_weather,
+    "query_products": query_products,
+    "search_knowledge_base": search_knowledge_base,
+}
+
+
+async def run_tool(fc):
+    """Execute one function_call off the event loop so parallel calls overlap.
+
+    Failures become error outputs for the model instead of aborting the whole turn.
+    """
+    try:
+        args = json.loads(fc.arguments)
+    except json.JSONDecodeError as e:
+        return fc.arguments, {"error": f"Invalid JSON arguments: {e}"}
+    tool_fn = TOOL_FUNCTIONS.get(fc.name)
+    if tool_fn is None:
+        return args, {"error": f"Unknown tool: {fc.name}"}
+    try:
+        return args, await asyncio.to_thread(tool_fn, args)
+    except Exception as e:
+        return args, {"error": f"{fc.name} failed: {type(e).__name__}: {e}"}
 
-    response = openai_client.responses.create(
-        input=[{"role": "user", "content": user_prompt}],
-        extra_body={"agent": {"name": agent.name, "type": "agent_reference"}},
+
+# ---------------------------------------------------------------------------
+# Tool-calling loop
+# ---------------------------------------------------------------------------
+async def send_message(user_prompt):
+    tool_log = []
+    log_json = "[]"
+    reply = ""
+    seen_calls: set[tuple[str, str]] = set()
+    stop_reason = None
+    try:
+        request = {"input": [{"role": "user", "content": user_prompt}]}
+
+        # First call, up to MAX_TOOL_ROUNDS follow-ups, and one tool-free wrap-up call
+        # if the loop has to stop early; text streams in as it arrives
+        for round_num in range(MAX_TOOL_ROUNDS + 2):
+            async with openai_client.responses.stream(
+                model=MODEL_DEPLOYMENT_NAME,
+                instructions=INSTRUCTIONS,
+                tools=TOOL_DEFINITIONS,
+                **request,
+            ) as stream:
+                # Text from separate rounds goes in separate paragraphs
+                sep = "\n\n" if reply else ""
+                async for event in stream:
+                    if event.type == "response.output_text.delta":
+                        reply += sep + event.delta
+                        sep = ""
+                        yield reply, log_json
+                response = await stream.get_final_response()
+
+            function_calls = [item for item in response.output if item.type == "function_call"]
+            if not function_calls or stop_reason:
+                break
+
+            # The model re-requesting only calls it already made means it is looping
+            signatures = {(fc.name, fc.arguments) for fc in function_calls}
+            if signatures <= seen_calls:
+                stop_reason = "the model repeated the same tool calls"
+            elif round_num == MAX_TOOL_ROUNDS:
+                stop_reason = f"reached the limit of {MAX_TOOL_ROUNDS} tool rounds"
+            if stop_reason:
+                # Answer the pending calls so the model knows why, then let it reply without tools
+                not_run = fast_dumps({"error": f"Not run: {stop_reason}. Answer with what you have."})
+                tool_results = [
+                    {"type": "function_call_output", "call_id": fc.call_id, "output": not_run}
+                    for fc in function_calls
+                ]
+                request = {"input": tool_results, "previous_response_id": response.id, "tool_choice": "none"}
+                continue
+            seen_calls |= signatures
+
+            # Parallel tool calls are independent — run them concurrently
+            results = await asyncio.gather(*(run_tool(fc) for fc in function_calls))
+
+            tool_results = []
+            for fc, (args, result) in zip(function_calls, results):
+                tool_log.append({"tool": fc.name, "input": args, "output": result})
+                tool_results.append({"type": "function_call_output", "call_id": fc.call_id, "output": fast_dumps(result)})
+            log_json = pretty_dumps(tool_log)
+            yield reply, log_json
+
+            request = {"input": tool_results, "previous_response_id": response.id}
+
+        if stop_reason:
+            note = f"Stopped: {stop_reason}."
+            reply = f"{reply}\n\n({note})" if reply else note
+        yield reply, log_json
+
+    except Exception as e:
+        error = f"Error: {type(e).__name__}: {e}\n\n{traceback.format_exc()}"
+        yield error, pretty_dumps(tool_log)
+
+
+# ---------------------------------------------------------------------------
+# Batch mode — one Batch API job for many independent prompts
+# ---------------------------------------------------------------------------
+def _summarize_output(body):
+    """Render a batched response body as its text, or the tool calls it requested."""
+    lines = []
+    for item in body.get("output", []):
+        if item.get("type") == "function_call":
+            lines.append(f"{item['name']}({item['arguments']})")
+        elif item.get("type") == "message":
+            lines.extend(c.get("text", "") for c in item.get("content", []))
+    return "\n".join(lines)
+
+
+async def batch_send(prompts):
+    """Run each prompt's first model turn through the Batch API, returned in prompt order.
+
+    Batch jobs can take minutes to hours, so this is only for non-interactive work
+    like checking which tools the model picks for the sample prompts.
+    """
+    lines = [
+        json.dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/responses",
+            "body": {
+                "model": BATCH_DEPLOYMENT_NAME,
+                "instructions": INSTRUCTIONS,
+                "tools": TOOL_DEFINITIONS,
+                "input": [{"role": "user", "content": prompt}],
+            },
+        })
+        for i, prompt in enumerate(prompts)
+    ]
+    batch_file = await openai_client.files.create(
+        file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+        purpose="batch",
     )
+    batch = await openai_client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/responses",
+        completion_window="24h",
+    )
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(BATCH_POLL_SECONDS)
+        batch = await openai_client.batches.retrieve(batch.id)
+    if batch.status != "completed":
+        raise RuntimeError(f"Batch {batch.id} ended with status '{batch.status}'")
+
+    results = ["No result returned."] * len(prompts)
+    content = await openai_client.files.content(batch.output_file_id)
+    for line in content.text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if record.get("error"):
+            text = f"Error: {record['error']}"
+        else:
+            text = _summarize_output(record["response"]["body"])
+        results[int(record["custom_id"])] = text
+    return results
 
-    return response.output_text
 
+async def run_batch_eval():
+    prompts = [p[0] for p in STARTER_PROMPTS]
+    try:
+        results = await batch_send(prompts)
+        return json.dumps(dict(zip(prompts, results)), indent=2)
+    except Exception as e:
+        return f"Error: {type(e).__name__}: {e}\n\n{traceback.format_exc()}"
 
-# Load setup guide markdown
-guide_path = Path(__file__).parent / "instructions.md"
-guide_content = guide_path.read_text(encoding="utf-8") if guide_path.exists() else "instructions.md not found."
+
+# ---------------------------------------------------------------------------
+# Gradio UI
+# ---------------------------------------------------------------------------
+GUIDE_PATH = Path(__file__).parent / "instructions.md"
 
 with gr.Blocks(title="Step 2: Agent with Tools", theme=gr.themes.Soft(primary_hue="purple")) as app:
-    gr.Markdown("# Step 1: Basic Azure Foundry Agent")
+    gr.Markdown("# Step 2: Agent with Tools")
+    gr.Markdown(
+        "This agent can **call your code** — weather lookup, product search, and knowledge base "
+        "queries — and uses the results to answer."
+    )
 
     with gr.Tab("Agent"):
-        constraint = gr.Textbox(
-            label="Response Constraint",
-            value=RESPONSE_CONSTRAINT,
-            interactive=False,
-        )
         user_prompt = gr.Textbox(
             label="Your Prompt",
-            placeholder="e.g., Tell me a one line story",
+            placeholder="e.g., What's the weather like in Seattle?",
             lines=2,
         )
+        gr.Examples(
+            examples=STARTER_PROMPTS,
+            inputs=user_prompt,
+            label="Click a prompt to fill it in, then press Send",
+        )
         send_btn = gr.Button("Send", variant="primary")
         response_output = gr.Textbox(
             label="Response",
             interactive=False,
         )
+        tool_calls_output = gr.Code(
+            label="Tool Calls",
+            language="json",
+            interactive=False,
+        )
         send_btn.click(
             fn=send_message,
             inputs=user_prompt,
-            outputs=response_output,
+            outputs=[response_output, tool_calls_output],
+        )
+
+    with gr.Tab("Tool Definitions"):
+        gr.Markdown("### Tool schemas passed via the `tools` parameter")
+        gr.Code(value=json.dumps(TOOL_DEFINITIONS, indent=2), language="json", label="tool_definitions.json")
+
+        gr.Markdown("---")
+        gr.Markdown(
+            "### Run as batch\n"
+            "Submit every sample prompt as one **Batch API** job and see which tools the model picks. "
+            "Batch jobs trade latency for throughput — results can take a while."
         )
+        batch_btn = gr.Button("Run sample prompts as batch", variant="secondary")
+        batch_output = gr.Code(label="Batch Results", language="json", interactive=False)
+        batch_btn.click(fn=run_batch_eval, outputs=batch_output)
 
-    with gr.Tab("Setup Guide"):
-        gr.Markdown(guide_content)
+    with gr.Tab("Setup Guide") as guide_tab:
+        guide_output = gr.Markdown()
+        guide_tab.select(fn=lambda: load_guide(GUIDE_PATH), outputs=guide_output)
 
+app.queue(default_concurrency_limit=CONCURRENCY_LIMIT, max_size=128)
 app.launch(footer_links=[])
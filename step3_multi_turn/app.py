@@ -1,19 +1,17 @@
 # Step 3: Multi-Turn Conversations using previous_response_id
 import os
-import sys
 import traceback
 from pathlib import Path
 
-# Add project root to path for shared imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
 import gradio as gr
-from shared import get_openai_client
+from shared import get_async_openai_client, load_guide
 
-openai_client = get_openai_client()
+openai_client = get_async_openai_client()
 
 MODEL_DEPLOYMENT_NAME = os.getenv("MODEL_DEPLOYMENT_NAME")
 
+CONCURRENCY_LIMIT = int(os.getenv("CONCURRENCY_LIMIT", "16"))
+
 INSTRUCTIONS = (
     "You are a friendly, attentive assistant with a great memory. "
     "Pay close attention to any personal details the user shares (name, hobbies, "
@@ -22,6 +20,14 @@ INSTRUCTIONS = (
     "the user has told you so far."
 )
 
+# Every MAX_TURNS turns the server-side chain is replaced by a compact summary,
+# so context (and per-turn cost/latency) stops growing on long sessions.
+MAX_TURNS = max(1, int(os.getenv("MAX_TURNS", "20")))  # 0 or less would divide by zero below
+SUMMARY_PROMPT = (
+    "Summarize our conversation so far in a few short bullet points. Include every "
+    "personal detail I have shared. Reply with the summary only."
+)
+
 STARTER_PROMPTS = [
     ["Hi! My name is Raj, I'm a cloud architect from Atlanta, Georgia and I love barbecue."],
     ["I have two cats named Pixel and Byte, and I'm learning to play guitar."],
@@ -32,34 +38,56 @@ STARTER_PROMPTS = [
 # ---------------------------------------------------------------------------
 # Multi-turn agent session — chains calls via previous_response_id
 # ---------------------------------------------------------------------------
-def chat(user_message, history, session_id):
-    """Send a message and maintain conversation context via previous_response_id."""
+async def summarize_session(session_id):
+    """One-shot summary of the chain ending at session_id, used to reseed a new chain."""
+    response = await openai_client.responses.create(
+        model=MODEL_DEPLOYMENT_NAME,
+        input=[{"role": "user", "content": SUMMARY_PROMPT}],
+        previous_response_id=session_id,
+    )
+    return response.output_text
+
+
+async def chat(user_message, history, session_id):
+    """Stream a reply and maintain conversation context via previous_response_id.
+
+    `history` is UI state only — the API receives just the new message.
+    """
+    completed_turns = len(history) // 2
+    history.append({"role": "user", "content": user_message})
+    history.append({"role": "assistant", "content": ""})
     try:
         kwargs = {
             "model": MODEL_DEPLOYMENT_NAME,
             "instructions": INSTRUCTIONS,
             "input": [{"role": "user", "content": user_message}],
         }
-        # Chain to previous response if we have a session
-        if session_id:
+        # Chain to previous response if we have a session, reseeding every MAX_TURNS turns
+        if session_id and completed_turns % MAX_TURNS == 0:
+            summary = await summarize_session(session_id)
+            kwargs["input"].insert(0, {
+                "role": "developer",
+                "content": f"Summary of the conversation so far:\n{summary}",
+            })
+        elif session_id:
             kwargs["previous_response_id"] = session_id
 
-        response = openai_client.responses.create(**kwargs)
-
-        # Store the response id as our session handle
-        new_session_id = response.id
-        assistant_reply = response.output_text
-
-        history.append({"role": "user", "content": user_message})
-        history.append({"role": "assistant", "content": assistant_reply})
+        new_session_id = session_id
+        async with openai_client.responses.stream(**kwargs) as stream:
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    history[-1]["content"] += event.delta
+                    yield history, "", session_id
+                elif event.type == "response.completed":
+                    # Store the response id as our session handle
+                    new_session_id = event.response.id
 
-        return history, "", new_session_id
+        yield history, "", new_session_id
 
     except Exception as e:
         error = f"Error: {type(e).__name__}: {e}\n\n{traceback.format_exc()}"
-        history.append({"role": "user", "content": user_message})
-        history.append({"role": "assistant", "content": error})
-        return history, "", session_id
+        history[-1]["content"] = error
+        yield history, "", session_id
 
 
 def reset_session():
@@ -70,8 +98,7 @@ def reset_session():
 # ---------------------------------------------------------------------------
 # Gradio UI
 # ---------------------------------------------------------------------------
-guide_path = Path(__file__).parent / "instructions.md"
-guide_content = guide_path.read_text(encoding="utf-8") if guide_path.exists() else "instructions.md not found."
+GUIDE_PATH = Path(__file__).parent / "instructions.md"
 
 with gr.Blocks(title="Step 3: Multi-Turn Conversation", theme=gr.themes.Soft(primary_hue="purple")) as app:
     gr.Markdown("# Step 3: Multi-Turn Conversation")
@@ -128,7 +155,9 @@ with gr.Blocks(title="Step 3: Multi-Turn Conversation", theme=gr.themes.Soft(pri
             outputs=[chatbot, user_input, session_id],
         )
 
-    with gr.Tab("Setup Guide"):
-        gr.Markdown(guide_content)
+    with gr.Tab("Setup Guide") as guide_tab:
+        guide_output = gr.Markdown()
+        guide_tab.select(fn=lambda: load_guide(GUIDE_PATH), outputs=guide_output)
 
+app.queue(default_concurrency_limit=CONCURRENCY_LIMIT, max_size=128)
 app.launch(footer_links=[])
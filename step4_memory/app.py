@@ -1,22 +1,39 @@
 # Step 4: Memory & Persistence using Context Providers
-import asyncio
 import os
-import sys
+import re
 import traceback
 from typing import Any
 from pathlib import Path
 
-# Add project root to path for shared imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
 import gradio as gr
 from agent_framework.azure import AzureOpenAIResponsesClient
 from agent_framework._sessions import AgentSession, BaseContextProvider, SessionContext, InMemoryHistoryProvider
-from shared import get_credential
+from shared import get_credential, load_guide
 
 MODEL_DEPLOYMENT_NAME = os.getenv("MODEL_DEPLOYMENT_NAME")
 PROJECT_ENDPOINT = os.getenv("AZURE_ENDPOINT")
 
+CONCURRENCY_LIMIT = int(os.getenv("CONCURRENCY_LIMIT", "16"))
+
+
+# ---------------------------------------------------------------------------
+# Fact extraction — one compiled pattern, one pass per message
+# ---------------------------------------------------------------------------
+FACT_PATTERN = re.compile(
+    r"\bmy name is\s+(?P<name>[\w'-]+)"
+    r"|\b(?:i'm from|i am from|i live in)\s+(?P<location>[^.!?]+?)(?=,?\s+and\b|[.!?]|$)"
+    r"|\b(?:i'm an?|i am an?|i work as(?: an?)?|my job is)\s+(?P<profession>[^.,!?]+?)(?=\s+(?:and|from)\b|[.,!?]|$)"
+    r"|\b(?:i love|i like|i enjoy|my hobby is|my favorite)\s+(?P<interest>[^.,!?]+?)(?=\s+and\b|[.,!?]|$)",
+    re.IGNORECASE,
+)
+
+FACT_LABELS = {
+    "name": ("Name", str.capitalize),
+    "location": ("Location", str.strip),
+    "profession": ("Profession", str.title),
+    "interest": ("Interest", str.title),
+}
+
 
 # ---------------------------------------------------------------------------
 # Context Provider — extracts and remembers user preferences
@@ -26,7 +43,7 @@ class UserPreferencesProvider(BaseContextProvider):
 
     def __init__(self) -> None:
         super().__init__(source_id="user-preferences-provider")
-        self.facts: list[str] = []
+        self.facts: dict[str, None] = {}
 
     async def before_run(
         self,
@@ -62,37 +79,12 @@ class UserPreferencesProvider(BaseContextProvider):
             text = msg.text if hasattr(msg, "text") else ""
             if not isinstance(text, str):
                 continue
-            lower = text.lower()
-
-            # Extract name
-            if "my name is" in lower:
-                name = lower.split("my name is")[-1].strip().split()[0].capitalize()
-                fact = f"Name: {name}"
-                if fact not in self.facts:
-                    self.facts.append(fact)
-
-            # Extract location
-            if "from " in lower and ("live" in lower or "i'm from" in lower or "i am from" in lower):
-                location = text.split("from")[-1].strip().rstrip(".,!").split(" and ")[0]
-                fact = f"Location: {location}"
-                if fact not in self.facts:
-                    self.facts.append(fact)
-
-            # Extract profession
-            for keyword in ["i'm a ", "i am a ", "i work as ", "my job is "]:
-                if keyword in lower:
-                    profession = text.lower().split(keyword)[-1].strip().split(".")[0].split(",")[0].split(" and ")[0]
-                    fact = f"Profession: {profession.title()}"
-                    if fact not in self.facts:
-                        self.facts.append(fact)
-
-            # Extract hobbies / likes
-            for keyword in ["i love ", "i like ", "i enjoy ", "my hobby is ", "my favorite "]:
-                if keyword in lower:
-                    interest = text.lower().split(keyword)[-1].strip().rstrip(".,!").split(" and ")[0]
-                    fact = f"Interest: {interest.title()}"
-                    if fact not in self.facts:
-                        self.facts.append(fact)
+
+            for match in FACT_PATTERN.finditer(text):
+                kind = match.lastgroup
+                label, fmt = FACT_LABELS[kind]
+                # dict keys keep insertion order and make the dedup check O(1)
+                self.facts.setdefault(f"{label}: {fmt(match.group(kind).strip())}")
 
     def get_memory_display(self) -> str:
         if not self.facts:
@@ -125,22 +117,25 @@ agent_session = agent.create_session()
 # ---------------------------------------------------------------------------
 # Chat logic
 # ---------------------------------------------------------------------------
-def chat(user_message, history):
+async def chat(user_message, history):
+    history.append({"role": "user", "content": user_message})
+    history.append({"role": "assistant", "content": ""})
     try:
-        result = asyncio.run(agent.run(user_message, session=agent_session))
-        assistant_reply = str(result)
-
-        history.append({"role": "user", "content": user_message})
-        history.append({"role": "assistant", "content": assistant_reply})
+        memory = memory_provider.get_memory_display()
+        stream = agent.run(user_message, session=agent_session, stream=True)
+        async for update in stream:
+            if update.text:
+                history[-1]["content"] += update.text
+                yield history, "", memory
 
-        memory_display = memory_provider.get_memory_display()
-        return history, "", memory_display
+        # Finalizing the stream runs the after_run providers (fact extraction, history)
+        await stream.get_final_response()
+        yield history, "", memory_provider.get_memory_display()
 
     except Exception as e:
         error = f"Error: {type(e).__name__}: {e}\n\n{traceback.format_exc()}"
-        history.append({"role": "user", "content": user_message})
-        history.append({"role": "assistant", "content": error})
-        return history, "", memory_provider.get_memory_display()
+        history[-1]["content"] = error
+        yield history, "", memory_provider.get_memory_display()
 
 
 def reset_session():
@@ -153,8 +148,7 @@ def reset_session():
 # ---------------------------------------------------------------------------
 # Gradio UI
 # ---------------------------------------------------------------------------
-guide_path = Path(__file__).parent / "instructions.md"
-guide_content = guide_path.read_text(encoding="utf-8") if guide_path.exists() else "instructions.md not found."
+GUIDE_PATH = Path(__file__).parent / "instructions.md"
 
 STARTER_PROMPTS = [
     ["Hi! My name is Raj, I'm a cloud architect from Atlanta, Georgia."],
@@ -224,7 +218,9 @@ with gr.Blocks(title="Step 4: Memory & Persistence", theme=gr.themes.Soft(primar
             outputs=[chatbot, user_input, memory_display],
         )
 
-    with gr.Tab("Setup Guide"):
-        gr.Markdown(guide_content)
+    with gr.Tab("Setup Guide") as guide_tab:
+        guide_output = gr.Markdown()
+        guide_tab.select(fn=lambda: load_guide(GUIDE_PATH), outputs=guide_output)
 
+app.queue(default_concurrency_limit=CONCURRENCY_LIMIT, max_size=128)
 app.launch(footer_links=[])
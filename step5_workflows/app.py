@@ -1,13 +1,13 @@
 # Step 5: Workflows — CI/CD Pipeline with Executors, Edges & Events
 import asyncio
-import sys
-import time
-import traceback
+import os
+import queue
+from collections import deque
+from contextlib import contextmanager
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-
-# Add project root to path for shared imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from time import localtime, monotonic, strftime, time
 
 import gradio as gr
 from agent_framework import (
@@ -19,12 +19,21 @@ from agent_framework import (
 )
 from agent_framework._workflows import Case, Default, WorkflowViz
 from typing_extensions import Never
+from shared import format_traceback, load_guide
 
 
 # ---------------------------------------------------------------------------
 # Data model passed between executors
 # ---------------------------------------------------------------------------
-@dataclass
+MAX_STEPS = 8  # longest path logs 6 steps
+TS_FORMAT = "%H:%M:%S"
+
+
+def _column():
+    return [None] * MAX_STEPS
+
+
+@dataclass(slots=True)
 class PipelineState:
     commit_sha: str = "a1b2c3d"
     branch: str = "main"
@@ -32,17 +41,42 @@ class PipelineState:
     build_tag: str = ""
     deployed_to: str = ""
     events: list[str] = field(default_factory=list)
-    step_log: list[dict] = field(default_factory=list)
+    # Step log kept as preallocated parallel columns; the first step_count entries are filled
+    step_ts: list = field(default_factory=_column)
+    step_name: list = field(default_factory=_column)
+    step_status: list = field(default_factory=_column)
+    step_detail: list = field(default_factory=_column)
+    step_count: int = 0
 
     def log(self, step: str, status: str, detail: str = ""):
-        self.step_log.append({
-            "step": step, "status": status, "detail": detail, "ts": time.strftime("%H:%M:%S"),
-        })
+        i = self.step_count
+        if i == len(self.step_name):
+            for column in (self.step_ts, self.step_name, self.step_status, self.step_detail):
+                column.extend(_column())
+        self.step_ts[i] = time()  # formatted when the step table is rendered
+        self.step_name[i] = step
+        self.step_status[i] = status
+        self.step_detail[i] = detail
+        self.step_count = i + 1
+
+    def steps(self):
+        """Iterate logged steps as (ts, step, status, detail) rows."""
+        n = self.step_count
+        return zip(self.step_ts[:n], self.step_name[:n], self.step_status[:n], self.step_detail[:n])
 
 
 # ---------------------------------------------------------------------------
 # Executors (each simulates a CI/CD stage)
 # ---------------------------------------------------------------------------
+# Stage delays are only for teaching — set SIMULATE_LATENCY=1 to watch the stages take time
+SIMULATE_LATENCY = os.getenv("SIMULATE_LATENCY", "").lower() in ("1", "true", "yes")
+
+
+async def simulate_work(seconds: float) -> None:
+    """Yield to the event loop, and only actually wait when SIMULATE_LATENCY is on."""
+    await asyncio.sleep(seconds if SIMULATE_LATENCY else 0)
+
+
 class RunUnitTests(Executor):
     """Run unit tests — passes for 'main', fails for 'bugfix'."""
 
@@ -51,7 +85,7 @@ class RunUnitTests(Executor):
 
     @handler(input=PipelineState, output=PipelineState)
     async def handle(self, state, ctx) -> None:
-        await asyncio.sleep(0.3)
+        await simulate_work(0.3)
         state.tests_passed = state.branch != "bugfix"
         status = "passed" if state.tests_passed else "failed"
         state.events.append(f"Unit tests {status} for {state.commit_sha}")
@@ -67,7 +101,7 @@ class NotifyDevTeam(Executor):
 
     @handler(input=PipelineState, workflow_output=PipelineState)
     async def handle(self, state, ctx) -> None:
-        await asyncio.sleep(0.2)
+        await simulate_work(0.2)
         state.events.append(f"ALERT: Dev team notified — tests failed on {state.branch}/{state.commit_sha}")
         state.log("Notify Dev Team", "sent", "Pipeline stopped due to test failure")
         await ctx.yield_output(state)
@@ -81,7 +115,7 @@ class BuildDockerImage(Executor):
 
     @handler(input=PipelineState, output=PipelineState)
     async def handle(self, state, ctx) -> None:
-        await asyncio.sleep(0.4)
+        await simulate_work(0.4)
         state.build_tag = f"app:{state.commit_sha[:7]}"
         state.events.append(f"Docker image built: {state.build_tag}")
         state.log("Build Docker Image", "success", f"Tag: {state.build_tag}")
@@ -96,7 +130,7 @@ class DeployToStaging(Executor):
 
     @handler(input=PipelineState, output=PipelineState)
     async def handle(self, state, ctx) -> None:
-        await asyncio.sleep(0.3)
+        await simulate_work(0.3)
         state.deployed_to = "staging"
         state.events.append(f"Deployed {state.build_tag} to staging — smoke test passed")
         state.log("Deploy to Staging", "deployed", f"Image: {state.build_tag}")
@@ -111,34 +145,50 @@ class PromoteToProduction(Executor):
 
     @handler(input=PipelineState, output=PipelineState)
     async def handle(self, state, ctx) -> None:
-        await asyncio.sleep(0.3)
+        await simulate_work(0.3)
         state.deployed_to = "production"
         state.events.append(f"Promoted {state.build_tag} to production")
         state.log("Promote to Production", "live", f"Image: {state.build_tag}")
         await ctx.send_message(state)
 
 
+async def send_success_alert(state: PipelineState) -> None:
+    await simulate_work(0.1)
+    state.events.append(f"EVENT: Deployment success — {state.build_tag} is live in production!")
+    state.log("Deployment Success Alert", "sent", "All stakeholders notified")
+
+
+async def emit_deploy_metrics(state: PipelineState) -> None:
+    await simulate_work(0.1)
+    state.events.append(f"METRIC: deployment.success recorded for {state.build_tag}")
+    state.log("Emit Deploy Metrics", "recorded", "deployment.success +1")
+
+
 @executor(id="deployment_success_alert")
 async def deployment_success_alert(
     state: PipelineState, ctx: WorkflowContext[Never, PipelineState]
 ) -> None:
-    """Send deployment success event — terminal node (yields workflow output)."""
-    await asyncio.sleep(0.1)
-    state.events.append(f"EVENT: Deployment success — {state.build_tag} is live in production!")
-    state.log("Deployment Success Alert", "sent", "All stakeholders notified")
+    """Send deployment success event — terminal node (yields workflow output).
+
+    The alert and the metrics emit don't depend on each other, so they run concurrently.
+    """
+    await asyncio.gather(send_success_alert(state), emit_deploy_metrics(state))
     await ctx.yield_output(state)
 
 
 # ---------------------------------------------------------------------------
 # Build the workflow graph
 # ---------------------------------------------------------------------------
-def create_workflow():
-    run_tests = RunUnitTests()
-    notify = NotifyDevTeam()
-    build = BuildDockerImage()
-    staging = DeployToStaging()
-    promote = PromoteToProduction()
+# Executors hold no per-run state (it all travels in PipelineState), so one instance
+# of each is shared by every graph built below.
+run_tests = RunUnitTests()
+notify = NotifyDevTeam()
+build = BuildDockerImage()
+staging = DeployToStaging()
+promote = PromoteToProduction()
 
+
+def create_workflow():
     return (
         WorkflowBuilder(name="CI/CD Pipeline", start_executor=run_tests)
         # Conditional edge: tests passed → build, tests failed → notify (stop)
@@ -155,27 +205,61 @@ def create_workflow():
     )
 
 
-# Generate Mermaid diagram
-try:
-    mermaid_diagram = WorkflowViz(create_workflow()).to_mermaid()
-except Exception:
-    mermaid_diagram = "Mermaid diagram generation not available."
+def create_bugfix_workflow():
+    """Failure path only — RunUnitTests always fails 'bugfix', so build/deploy are never reached."""
+    return (
+        WorkflowBuilder(name="CI/CD Pipeline (bugfix)", start_executor=run_tests)
+        .add_edge(run_tests, notify)
+        .build()
+    )
+
+
+# The graph is pure and reusable — only PipelineState is per run. A Workflow instance
+# rejects overlapping runs, so concurrent clicks each check one out of a small pool
+# (one pool per graph variant). A burst past WORKFLOW_POOL_SIZE builds extra
+# workflows, which are dropped after their run instead of kept.
+WORKFLOW_POOL_SIZE = 4
+_WORKFLOW = create_workflow()
+_WORKFLOW_BUILDERS = {"full": create_workflow, "bugfix": create_bugfix_workflow}
+_workflow_pools = {variant: queue.Queue(maxsize=WORKFLOW_POOL_SIZE) for variant in _WORKFLOW_BUILDERS}
+_workflow_pools["full"].put(_WORKFLOW)
+
+
+@contextmanager
+def checkout_workflow(branch: str):
+    variant = "bugfix" if branch == "bugfix" else "full"
+    pool = _workflow_pools[variant]
+    try:
+        wf = pool.get_nowait()
+    except queue.Empty:
+        wf = _WORKFLOW_BUILDERS[variant]()
+    try:
+        yield wf
+    finally:
+        try:
+            pool.put_nowait(wf)
+        except queue.Full:
+            pass
+
+
+# Mermaid diagram, generated the first time the Workflow Graph tab is opened
+@lru_cache(maxsize=1)
+def mermaid_diagram():
+    try:
+        return WorkflowViz(_WORKFLOW).to_mermaid()
+    except Exception:
+        return "Mermaid diagram generation not available."
 
 
 # ---------------------------------------------------------------------------
 # Run workflow
 # ---------------------------------------------------------------------------
-def run_pipeline(branch: str):
+async def run_pipeline(branch: str):
     try:
-        wf = create_workflow()
         state = PipelineState(commit_sha="a1b2c3d", branch=branch)
 
-        # Run in a new event loop to avoid conflict with Gradio's loop
-        loop = asyncio.new_event_loop()
-        try:
-            result = loop.run_until_complete(wf.run(state))
-        finally:
-            loop.close()
+        with checkout_workflow(branch) as wf:
+            result = await wf.run(state)
 
         outputs = result.get_outputs()
         final_state = outputs[0] if outputs else state
@@ -184,9 +268,10 @@ def run_pipeline(branch: str):
         event_log = "\n".join(f"  {i+1}. {e}" for i, e in enumerate(final_state.events))
 
         # Format step table
-        step_table = ""
-        for s in final_state.step_log:
-            step_table += f"| {s['ts']} | {s['step']:<28} | {s['status']:<10} | {s['detail']} |\n"
+        step_table = "\n".join(
+            f"| {strftime(TS_FORMAT, localtime(ts))} | {step:<28} | {status:<10} | {detail} |"
+            for ts, step, status, detail in final_state.steps()
+        )
 
         outcome = (
             "Deployed to production"
@@ -203,18 +288,51 @@ def run_pipeline(branch: str):
             f"|------|------|--------|--------|\n{step_table}"
         )
 
-        return outcome, summary
+        return outcome, summary, None
 
     except Exception as e:
-        error = f"Error: {type(e).__name__}: {e}\n\n{traceback.format_exc()}"
-        return "Error", error
+        return "Error", f"Error: {type(e).__name__}: {e}", e
+
+
+# ---------------------------------------------------------------------------
+# Event-loop lag telemetry — a sleeper that measures how late it wakes up
+# ---------------------------------------------------------------------------
+LAG_PROBE_INTERVAL = 1.0
+LAG_WARN_MS = 50
+_lag_samples_ms: deque[float] = deque(maxlen=300)
+_lag_probe_task = None
+
+
+async def _lag_probe() -> None:
+    while True:
+        start = monotonic()
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+        drift_ms = (monotonic() - start - LAG_PROBE_INTERVAL) * 1000
+        _lag_samples_ms.append(drift_ms)
+        if drift_ms > LAG_WARN_MS:
+            print(f"[lag-probe] event loop stalled for {drift_ms:.0f} ms")
+
+
+async def start_lag_probe() -> None:
+    """Start the probe once, on Gradio's event loop (the one run_pipeline uses)."""
+    global _lag_probe_task
+    if _lag_probe_task is None:
+        _lag_probe_task = asyncio.create_task(_lag_probe())
+
+
+def lag_report() -> str:
+    if not _lag_samples_ms:
+        return "No samples yet."
+    samples = sorted(_lag_samples_ms)
+    p50 = samples[len(samples) // 2]
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"samples: {len(samples)} | p50: {p50:.1f} ms | p99: {p99:.1f} ms | max: {samples[-1]:.1f} ms"
 
 
 # ---------------------------------------------------------------------------
 # Gradio UI
 # ---------------------------------------------------------------------------
-guide_path = Path(__file__).parent / "instructions.md"
-guide_content = guide_path.read_text(encoding="utf-8") if guide_path.exists() else "instructions.md not found."
+GUIDE_PATH = Path(__file__).parent / "instructions.md"
 
 PIPELINE_DIAGRAM = """
 ```
@@ -249,6 +367,7 @@ PIPELINE_DIAGRAM = """
     │ EVENT:           │
     │ Deployment       │
     │ Success Alert    │
+    │ ‖ Emit Metrics   │
     └──────────────────┘
 ```
 """
@@ -283,21 +402,34 @@ with gr.Blocks(title="Step 5: Workflows", theme=gr.themes.Soft(primary_hue="purp
         outcome_output = gr.Textbox(label="Outcome", interactive=False)
         detail_output = gr.Markdown(label="Pipeline Details")
 
+        error_state = gr.State()
+        with gr.Accordion("Show traceback", open=False):
+            traceback_output = gr.Code(language=None, label="Traceback")
+
         run_btn.click(
             fn=run_pipeline,
             inputs=branch_input,
-            outputs=[outcome_output, detail_output],
-        )
+            outputs=[outcome_output, detail_output, error_state],
+        ).then(fn=format_traceback, inputs=error_state, outputs=traceback_output)
+
+        with gr.Accordion("Event loop lag", open=False):
+            lag_output = gr.Textbox(label="Scheduling delay of a 1s sleeper", interactive=False)
+            lag_btn = gr.Button("Refresh", variant="secondary", size="sm")
+            lag_btn.click(fn=lag_report, outputs=lag_output, api_name="metrics")
 
-    with gr.Tab("Workflow Graph"):
+    with gr.Tab("Workflow Graph") as graph_tab:
         gr.Markdown("### Mermaid Diagram (auto-generated)")
         gr.Markdown(
             "Generated by `WorkflowViz(workflow).to_mermaid()` — "
             "paste into any Mermaid renderer to visualize."
         )
-        gr.Code(value=mermaid_diagram, language=None, label="Mermaid Source")
+        mermaid_output = gr.Code(language=None, label="Mermaid Source")
+        graph_tab.select(fn=mermaid_diagram, outputs=mermaid_output)
+
+    with gr.Tab("Setup Guide") as guide_tab:
+        guide_output = gr.Markdown()
+        guide_tab.select(fn=lambda: load_guide(GUIDE_PATH), outputs=guide_output)
 
-    with gr.Tab("Setup Guide"):
-        gr.Markdown(guide_content)
+    app.load(fn=start_lag_probe)
 
 app.launch(footer_links=[])
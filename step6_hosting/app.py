@@ -1,58 +1,112 @@
 # Step 6: Test UI for the hosted Azure Functions agent
 # This Gradio app lets you test the agent running via `func start`
+import asyncio
 import json
-import traceback
+import sys
+from functools import lru_cache
 from pathlib import Path
 
+# Put the project root on the path for shared imports, as function_app.py does, so
+# this UI also runs as a plain script without installing the repo
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
 import gradio as gr
-import requests
+import httpx
+from shared import format_traceback, load_guide
 
 DEFAULT_BASE_URL = "http://localhost:7071"
 AGENT_NAME = "HostedAgent"
+AGENT_PATH = f"/api/agents/{AGENT_NAME}/run"
+HEALTH_PATH = "/api/health"
+MAX_POLLS = 30
+POLL_INTERVAL_SECONDS = 1.0
+
+# One pooled async client: repeat clicks reuse the connection to the Functions host
+# and a slow agent run never ties up a Gradio worker thread.
+_CLIENT = httpx.AsyncClient(
+    timeout=httpx.Timeout(30, connect=3),
+    limits=httpx.Limits(max_connections=8, max_keepalive_connections=8),
+    headers={"Content-Type": "text/plain"},
+)
 
 
 # ---------------------------------------------------------------------------
 # Call the hosted agent endpoint
 # ---------------------------------------------------------------------------
-def call_agent(user_prompt, base_url):
-    try:
-        url = f"{base_url.rstrip('/')}/api/agents/{AGENT_NAME}/run"
+# The base URL textbox rarely changes, so endpoint URLs are built once per value
+@lru_cache(maxsize=4)
+def _agent_url(base_url):
+    return base_url.rstrip("/") + AGENT_PATH
+
+
+@lru_cache(maxsize=4)
+def _health_url(base_url):
+    return base_url.rstrip("/") + HEALTH_PATH
 
-        resp = requests.post(
-            url,
-            headers={"Content-Type": "text/plain"},
-            data=user_prompt,
-            timeout=30,
-        )
+
+async def poll_for_result(resp):
+    """Follow a 202's Location header until the run finishes; returns the last response."""
+    location = resp.headers.get("Location")
+    if not location:
+        return resp
+    status_url = resp.url.join(location)
+    for _ in range(MAX_POLLS):
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+        poll = await _CLIENT.get(status_url)
+        if poll.status_code != 202:
+            return poll
+    return resp
+
+
+async def call_agent(user_prompt, base_url):
+    try:
+        url = _agent_url(base_url)
+
+        async with _CLIENT.stream("POST", url, content=user_prompt) as resp:
+            if resp.status_code == 200:
+                # Show the reply as it arrives instead of waiting for the whole body
+                text = ""
+                async for chunk in resp.aiter_text():
+                    text += chunk
+                    yield text, "Status: 200 OK (receiving...)", None
+                yield text, f"Status: {resp.status_code} OK", None
+                return
+            await resp.aread()
+
+        if resp.status_code == 202:
+            resp = await poll_for_result(resp)
 
         if resp.status_code == 200:
-            return resp.text, f"Status: {resp.status_code} OK"
+            yield resp.text, f"Status: {resp.status_code} OK", None
         elif resp.status_code == 202:
-            # Async — poll for result
+            # Still running after polling (or no status URL to poll)
             body = resp.json()
             detail = json.dumps(body, indent=2)
-            return f"Accepted (async). Response:\n{detail}", f"Status: {resp.status_code} Accepted"
+            yield f"Accepted (async). Response:\n{detail}", f"Status: {resp.status_code} Accepted", None
         else:
-            return f"HTTP {resp.status_code}: {resp.text}", f"Status: {resp.status_code}"
+            yield f"HTTP {resp.status_code}: {resp.text}", f"Status: {resp.status_code}", None
 
-    except requests.ConnectionError:
-        return (
+    except (httpx.ConnectError, httpx.ConnectTimeout):
+        yield (
             "Connection refused. Is the Functions host running?\n\n"
             "Start it with:\n  cd step6_hosting && func start",
             "Status: Connection Error",
+            None,
         )
     except Exception as e:
-        return f"Error: {type(e).__name__}: {e}\n\n{traceback.format_exc()}", "Status: Error"
+        yield f"Error: {type(e).__name__}: {e}", "Status: Error", e
 
 
-def check_health(base_url):
+async def check_health(base_url):
     try:
-        url = f"{base_url.rstrip('/')}/api/health"
-        resp = requests.get(url, timeout=5)
+        url = _health_url(base_url)
+        resp = await _CLIENT.get(url, timeout=5)
         if resp.status_code == 200:
             return f"Healthy (HTTP {resp.status_code})"
         return f"HTTP {resp.status_code}: {resp.text}"
-    except requests.ConnectionError:
+    except (httpx.ConnectError, httpx.ConnectTimeout):
         return "Not reachable — is `func start` running?"
     except Exception as e:
         return f"Error: {e}"
@@ -61,8 +115,8 @@ def check_health(base_url):
 # ---------------------------------------------------------------------------
 # Gradio UI
 # ---------------------------------------------------------------------------
-guide_path = Path(__file__).parent / "instructions.md"
-guide_content = guide_path.read_text(encoding="utf-8") if guide_path.exists() else "instructions.md not found."
+GUIDE_PATH = Path(__file__).parent / "instructions.md"
+FUNC_APP_PATH = Path(__file__).parent / "function_app.py"
 
 SAMPLE_PROMPTS = [
     "Tell me a short joke about cloud computing.",
@@ -99,7 +153,7 @@ with gr.Blocks(title="Step 6: Host Your Agent", theme=gr.themes.Soft(primary_hue
 
         gr.Markdown("---")
         gr.Markdown("### Send a request")
-        gr.Markdown(f"**Endpoint:** `POST /api/agents/{AGENT_NAME}/run`")
+        gr.Markdown(f"**Endpoint:** `POST {AGENT_PATH}`")
 
         with gr.Row():
             example_btns = []
@@ -119,19 +173,23 @@ with gr.Blocks(title="Step 6: Host Your Agent", theme=gr.themes.Soft(primary_hue
         response_output = gr.Textbox(label="Agent Response", interactive=False, lines=4)
         status_output = gr.Textbox(label="HTTP Status", interactive=False)
 
+        error_state = gr.State()
+        with gr.Accordion("Show traceback", open=False):
+            traceback_output = gr.Code(language=None, label="Traceback")
+
         send_btn.click(
             fn=call_agent,
             inputs=[user_prompt, base_url],
-            outputs=[response_output, status_output],
-        )
+            outputs=[response_output, status_output, error_state],
+        ).then(fn=format_traceback, inputs=error_state, outputs=traceback_output)
 
-    with gr.Tab("function_app.py"):
+    with gr.Tab("function_app.py") as func_app_tab:
         gr.Markdown("### Agent Registration Code")
-        func_app_path = Path(__file__).parent / "function_app.py"
-        func_app_code = func_app_path.read_text(encoding="utf-8") if func_app_path.exists() else "Not found."
-        gr.Code(value=func_app_code, language="python", label="function_app.py")
+        func_app_output = gr.Code(language="python", label="function_app.py")
+        func_app_tab.select(fn=lambda: load_guide(FUNC_APP_PATH), outputs=func_app_output)
 
-    with gr.Tab("Setup Guide"):
-        gr.Markdown(guide_content)
+    with gr.Tab("Setup Guide") as guide_tab:
+        guide_output = gr.Markdown()
+        guide_tab.select(fn=lambda: load_guide(GUIDE_PATH), outputs=guide_output)
 
 app.launch(footer_links=[])
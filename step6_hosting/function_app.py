@@ -9,8 +9,11 @@ import sys
 from pathlib import Path
 from typing import Any
 
-# Add project root to path for shared imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
+# The Functions host doesn't install this repo as a package, so put the project root
+# on the path for shared imports (once — the host may re-import this module)
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
 
 from agent_framework.azure import AgentFunctionApp, AzureOpenAIResponsesClient
 from shared import get_credential
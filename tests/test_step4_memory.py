@@ -0,0 +1,63 @@
+"""Step 4: the memory provider must see a streamed turn once it finishes."""
+import asyncio
+import importlib.util
+from pathlib import Path
+
+import gradio as gr
+import pytest
+from agent_framework import BaseChatClient, ChatResponseUpdate, Content
+
+APP_PATH = Path(__file__).resolve().parents[1] / "step4_memory" / "app.py"
+
+
+class StreamingStubClient(BaseChatClient):
+    """Streams a canned reply instead of calling Azure OpenAI."""
+
+    def _inner_get_response(self, *, messages, stream, options, **kwargs):
+        async def _updates():
+            for word in ("Nice ", "to ", "meet ", "you!"):
+                yield ChatResponseUpdate(role="assistant", contents=[Content.from_text(word)])
+
+        return self._build_response_stream(_updates())
+
+
+@pytest.fixture
+def step4(monkeypatch):
+    monkeypatch.setenv("AZURE_ENDPOINT", "https://example.services.ai.azure.com/api/projects/test")
+    monkeypatch.setenv("AZURE_TENANT_ID", "test-tenant")
+    monkeypatch.setenv("AZURE_CLIENT_ID", "test-client")
+    monkeypatch.setenv("AZURE_CLIENT_SECRET", "test-secret")
+    monkeypatch.setenv("MODEL_DEPLOYMENT_NAME", "test-deployment")
+    monkeypatch.setattr(gr.Blocks, "launch", lambda self, *args, **kwargs: None)
+
+    spec = importlib.util.spec_from_file_location("step4_app", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    module.agent = StreamingStubClient().as_agent(
+        name="MemoryAgent",
+        context_providers=[module.memory_provider, module.history_provider],
+    )
+    module.agent_session = module.agent.create_session()
+    return module
+
+
+def run_turn(step4, message):
+    async def collect():
+        return [out async for out in step4.chat(message, [])]
+
+    history, _, memory = asyncio.run(collect())[-1]
+    return history, memory
+
+
+def test_facts_appear_after_one_streamed_turn(step4):
+    history, memory = run_turn(step4, "Hi! My name is Raj and I love hiking.")
+
+    assert history[-1]["content"] == "Nice to meet you!"
+    assert memory == "- Name: Raj\n- Interest: Hiking"
+
+
+def test_location_keeps_inner_commas_but_not_trailing_ones(step4):
+    _, memory = run_turn(step4, "I'm from Atlanta, Georgia, and I like chess.")
+
+    assert memory == "- Location: Atlanta, Georgia\n- Interest: Chess"